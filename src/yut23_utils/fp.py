@@ -3,43 +3,53 @@
 # SPDX-License-Identifier: BSD-3-Clause
 """Tools for working with floating-point numbers."""
 
-import math
 import struct
-from dataclasses import dataclass, field
-from functools import cached_property
 from typing import cast
 
+# precompiled so the format strings aren't parsed on every conversion, with
+# the bound methods pulled out to skip the attribute lookups
+_FLOAT64 = struct.Struct("<d")
+_UINT64 = struct.Struct("<Q")
+_pack_f64 = _FLOAT64.pack
+_unpack_f64 = _FLOAT64.unpack
+_pack_u64 = _UINT64.pack
+_unpack_u64 = _UINT64.unpack
+
+# FP64 layout constants, computed once rather than on each use
+_EXP_BITS = 11
+_MANT_BITS = 52
+_SIGN_SHIFT = _EXP_BITS + _MANT_BITS
+_EXP_MASK = (1 << _EXP_BITS) - 1
+_MANT_MASK = (1 << _MANT_BITS) - 1
+_SIGN_BIT = 1 << _SIGN_SHIFT
+_MAGNITUDE_MASK = _SIGN_BIT - 1
+_EXP_FIELD = _EXP_MASK << _MANT_BITS
+
 
 def float_to_int(x: float, /) -> int:
-    return cast(int, struct.unpack("<Q", struct.pack("<d", x))[0])
+    return cast(int, _unpack_u64(_pack_f64(x))[0])
 
 
 def int_to_float(q: int, /) -> float:
-    return cast(float, struct.unpack("<d", struct.pack("<Q", q))[0])
+    return cast(float, _unpack_f64(_pack_u64(q))[0])
 
 
 def ulp_diff(a: float, b: float, /, *, include_sign: bool = False) -> int:
     """Return the number of representable FP64 values in the range [a, b)."""
-    if not math.isfinite(a) or not math.isfinite(b):
+    ua = _unpack_u64(_pack_f64(a))[0]
+    ub = _unpack_u64(_pack_f64(b))[0]
+    # infinities and NaNs have all exponent bits set
+    if _EXP_FIELD in (ua & _EXP_FIELD, ub & _EXP_FIELD):
         msg = "only finite values can be compared"
         raise ValueError(msg)
-    if a == b:
-        # this case also covers 0.0 vs -0.0, which compare equal but have
-        # different representations
-        return 0
-    if a > b:
-        # pylint: disable-next=arguments-out-of-order
-        ulps = ulp_diff(b, a)
-        if include_sign:
-            ulps *= -1
+    # map the sign-magnitude representations onto a monotone integer line,
+    # so the distance is a single subtraction; 0.0 and -0.0 both map to 0
+    ka = -(ua & _MAGNITUDE_MASK) if ua & _SIGN_BIT else ua
+    kb = -(ub & _MAGNITUDE_MASK) if ub & _SIGN_BIT else ub
+    ulps = kb - ka
+    if include_sign:
         return ulps
-    # b is now greater than a in value
-    if math.copysign(1.0, a) != math.copysign(1.0, b):
-        # different signs: split the interval at zero
-        return ulp_diff(a, -0.0) + ulp_diff(0.0, b)
-    # subtract the smaller in magnitude from the larger
-    smaller, larger = sorted((a, b), key=abs)
-    return float_to_int(larger) - float_to_int(smaller)
+    return abs(ulps)
 
 
 def compare_ulp(a: float, b: float, /, ulps: int) -> bool:
@@ -50,32 +60,51 @@ def compare_ulp(a: float, b: float, /, ulps: int) -> bool:
     return ulp_diff(a, b, include_sign=False) <= ulps
 
 
-def _make_mask(bits: int) -> int:
-    return (1 << bits) - 1
-
-
-@dataclass(frozen=True)
 class FloatInspector:
-    float_val: float
-    int_val: int = field(init=False)
-
-    EXP_BITS = 11
-    MANT_BITS = 52
+    __slots__ = ("float_val", "int_val", "raw_sign", "raw_exponent", "raw_mantissa")
 
-    def __post_init__(self):
-        object.__setattr__(self, "int_val", float_to_int(self.float_val))
-
-    @cached_property
-    def raw_sign(self) -> int:
-        return (self.int_val >> (self.EXP_BITS + self.MANT_BITS)) & 1
-
-    @cached_property
-    def raw_exponent(self) -> int:
-        return (self.int_val >> self.MANT_BITS) & _make_mask(self.EXP_BITS)
-
-    @cached_property
-    def raw_mantissa(self) -> int:
-        return self.int_val & _make_mask(self.MANT_BITS)
+    float_val: float
+    int_val: int
+    raw_sign: int
+    raw_exponent: int
+    raw_mantissa: int
+
+    EXP_BITS = _EXP_BITS
+    MANT_BITS = _MANT_BITS
+
+    def __init__(self, float_val: float):
+        int_val = float_to_int(float_val)
+        # all the fields come from the same bits, so split them up front
+        # rather than lazily
+        setattr_ = object.__setattr__
+        setattr_(self, "float_val", float_val)
+        setattr_(self, "int_val", int_val)
+        setattr_(self, "raw_sign", int_val >> _SIGN_SHIFT)
+        setattr_(self, "raw_exponent", (int_val >> _MANT_BITS) & _EXP_MASK)
+        setattr_(self, "raw_mantissa", int_val & _MANT_MASK)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        msg = f"cannot assign to field {name!r}"
+        raise AttributeError(msg)
+
+    def __delattr__(self, name: str) -> None:
+        msg = f"cannot delete field {name!r}"
+        raise AttributeError(msg)
+
+    def __reduce__(self) -> tuple[type, tuple[float]]:
+        # the fields can't be restored through __setattr__, so rebuild from
+        # the float for copy and pickle
+        return (FloatInspector, (self.float_val,))
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        other = cast(FloatInspector, other)
+        # compare the floats too, so NaNs are unequal like with a dataclass
+        return (self.float_val, self.int_val) == (other.float_val, other.int_val)
+
+    def __hash__(self) -> int:
+        return hash(self.int_val)
 
     def __str__(self) -> str:
         return (
@@ -93,11 +122,11 @@ class FloatInspector:
     def __float__(self) -> float:
         return self.float_val
 
-    @cached_property
+    @property
     def exponent(self) -> int:
         return self.raw_exponent - 1023
 
-    @cached_property
+    @property
     def mantissa(self) -> float:
         frac = self.raw_mantissa / (1 << 52)
         if self.raw_exponent == 0:
@@ -113,10 +142,10 @@ class FloatInspector:
         return bool(self.raw_sign)
 
     def is_inf(self) -> bool:
-        return self.raw_exponent == _make_mask(self.EXP_BITS) and self.raw_mantissa == 0
+        return self.raw_exponent == _EXP_MASK and self.raw_mantissa == 0
 
     def is_nan(self) -> bool:
-        return self.raw_exponent == _make_mask(self.EXP_BITS) and self.raw_mantissa != 0
+        return self.raw_exponent == _EXP_MASK and self.raw_mantissa != 0
 
     def is_subnormal(self) -> bool:
         return self.raw_exponent == 0 and self.raw_mantissa != 0
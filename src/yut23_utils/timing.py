@@ -6,14 +6,15 @@ from __future__ import annotations
 
 import enum
 import math
-import statistics
+import sys
 import warnings
-from dataclasses import dataclass
-from functools import cached_property
+from array import array
+from time import perf_counter_ns
 from timeit import Timer, default_timer
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, cast
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
     from typing import Any, Callable
 
     from typing_extensions import Self
@@ -22,10 +23,25 @@ if TYPE_CHECKING:
 __all__ = ["TimingFormat", "TimingInfo", "timeit", "ContextTimer"]
 
 
+_MILLISECOND = 1e-3
+_MICROSECOND = 1e-6
+
+# (scale, suffix) for each order returned by _calc_order()
+_UNITS = ((1.0, " s"), (1e3, " ms"), (1e6, " μs"), (1e9, " ns"))
+
+
 def _calc_order(timespan: float) -> int:
+    # there are only four units, so compare directly instead of using log10;
+    # seconds are checked first, as they're the most common case
+    if timespan >= 1.0:
+        return 0
     if timespan == 0:
         return 3
-    return min(max(0, -int(math.floor(math.log10(timespan)) // 3)), 3)
+    if timespan >= _MILLISECOND:
+        return 1
+    if timespan >= _MICROSECOND:
+        return 2
+    return 3
 
 
 # modified from IPython/core/magics/execution.py
@@ -38,12 +54,10 @@ def format_time(
 ) -> str:
     """Formats the timespan in a human readable form"""
 
-    units = ["s", "ms", "μs", "ns"]
-    scaling = [1, 1e3, 1e6, 1e9]
-
     if order is None:
         order = _calc_order(timespan)
-    return f"{timespan * scaling[order]:.{precision}{fmt}} {units[order]}"
+    scale, unit = _UNITS[order]
+    return f"{timespan * scale:.{precision}{fmt}}{unit}"
 
 
 class TimingFormat(enum.Enum):
@@ -52,83 +66,224 @@ class TimingFormat(enum.Enum):
     TIMEIT = enum.auto()
 
 
-@dataclass(frozen=True)
-class TimingInfo:
-    times: tuple[float, ...]
-    num_loops: int
+# ANSI escapes for the hyperfine-style output
+_BOLD_GREEN = "\033[1;32m"
+_GREEN = "\033[32m"
+_CYAN = "\033[36m"
+_MAGENTA = "\033[35m"
+_DIM = "\033[2m"
+_RESET = "\033[0m"
 
-    @cached_property
-    def repeat(self) -> int:
-        return len(self.times)
 
-    @cached_property
-    def mean(self) -> float:
-        return statistics.mean(self.times)
+def _make_hyperfine_templates(*, color: bool) -> tuple[str, str]:
+    """Build the single- and multi-run hyperfine templates.
 
-    @cached_property
-    def stdev(self) -> float:
-        if self.repeat > 1:
-            return statistics.stdev(self.times, xbar=self.mean)
-        return float("nan")
+    All the constant parts are interpolated here, so only the numbers are
+    left to fill in.
+    """
+    if color:
+        bg, g, c, m, f, r = _BOLD_GREEN, _GREEN, _CYAN, _MAGENTA, _DIM, _RESET
+    else:
+        bg = g = c = m = f = r = ""
+    single = (
+        f"  Time ({bg}abs{r} ≡):     "
+        f"   {bg}{{time}}{r}           "
+        f"    {f}{{runs}} run, {{loops}} each{r}"
+    )
+    multi = (
+        f"  Time ({bg}mean{r} ± {g}\u03c3{r}):  "
+        f"   {bg}{{mean}}{r} ± {g}{{stdev}}{r}\n"
+        f"  Range ({c}min{r} … {m}max{r}):"
+        f"   {c}{{min}}{r} … {m}{{max}}{r}"
+        f"    {f}{{runs}} runs, {{loops}} each{r}"
+    )
+    return single, multi
+
+
+# output templates, keyed by whether to use color for the hyperfine ones
+_HYPERFINE_TEMPLATES = {
+    True: _make_hyperfine_templates(color=True),
+    False: _make_hyperfine_templates(color=False),
+}
+_IPYTHON_TEMPLATE = (
+    "{mean} ± {stdev} per loop (mean ± std. dev. of {runs}, {loops} each)"
+)
+_TIMEIT_TEMPLATE = "{loops}, best of {runs}: {best} per loop"
+
+
+# the summary statistics, which are computed together on first access
+_STAT_NAMES = frozenset(("mean", "stdev", "min", "max"))
 
-    @cached_property
-    def min(self) -> float:
-        return min(self.times)
 
-    @cached_property
-    def max(self) -> float:
-        return max(self.times)
+class TimingInfo:
+    # a hand-written slotted class rather than a frozen dataclass; the
+    # statistics are slots that start out empty and are filled in by
+    # __getattr__, so later reads are plain slot lookups
+    __slots__ = (
+        "_times",
+        "_num_loops",
+        "mean",
+        "stdev",
+        "min",
+        "max",
+        "_pretty_cache",
+    )
+
+    _times: array[float]
+    _num_loops: int
+    mean: float
+    stdev: float
+    min: float
+    max: float
+    _pretty_cache: dict[tuple[TimingFormat, bool], str]
+
+    def __init__(self, times: Iterable[float], num_loops: int):
+        setattr_ = object.__setattr__
+        # unboxed doubles, rather than a tuple of float objects
+        setattr_(self, "_times", array("d", times))
+        setattr_(self, "_num_loops", num_loops)
+        setattr_(self, "_pretty_cache", {})
+
+    def __setattr__(self, name: str, value: object) -> None:
+        msg = f"cannot assign to field {name!r}"
+        raise AttributeError(msg)
+
+    def __delattr__(self, name: str) -> None:
+        msg = f"cannot delete field {name!r}"
+        raise AttributeError(msg)
+
+    def __reduce__(self) -> tuple[type, tuple[array[float], int]]:
+        # the slots can't be restored through __setattr__, so rebuild from the
+        # constructor arguments for copy and pickle
+        return (TimingInfo, (self._times, self._num_loops))
+
+    def __getattr__(self, name: str) -> float:
+        # only called when a slot is still empty
+        if name in _STAT_NAMES:
+            self._fill_stats()
+            return cast(float, object.__getattribute__(self, name))
+        msg = f"{type(self).__name__!r} object has no attribute {name!r}"
+        raise AttributeError(msg)
+
+    def __repr__(self) -> str:
+        return f"TimingInfo(times={self.times!r}, num_loops={self._num_loops!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        other = cast(TimingInfo, other)
+        return self._times == other._times and self._num_loops == other._num_loops
+
+    def __hash__(self) -> int:
+        # hash the values rather than the raw bytes, so that equal arrays
+        # (e.g. with 0.0 and -0.0) get the same hash
+        return hash((tuple(self._times), self._num_loops))
+
+    @property
+    def times(self) -> tuple[float, ...]:
+        # a copy, as the cached statistics and hash depend on the stored times
+        return tuple(self._times)
 
-    def pretty(self, fmt: TimingFormat) -> str:
-        def label_count(num: int, item: str) -> str:
-            return f"{num} {item}{'' if num == 1 else 's'}"
+    @property
+    def num_loops(self) -> int:
+        return self._num_loops
 
-        loop_str = label_count(self.num_loops, "loop")
+    @property
+    def repeat(self) -> int:
+        return len(self._times)
+
+    def _fill_stats(self) -> None:
+        # statistics.mean/stdev do exact (Fraction-based) summation, which is
+        # overkill here; fsum is still correctly rounded
+        times = self._times
+        n = len(times)
+        mean = math.fsum(times) / n
+        stdev = math.nan
+        if n > 1:
+            # math.dist gives the root of the sum of squared deviations from
+            # the mean in C, without a Python-level loop
+            stdev = math.dist(times, [mean] * n) / math.sqrt(n - 1)
+        setattr_ = object.__setattr__
+        setattr_(self, "mean", mean)
+        setattr_(self, "stdev", stdev)
+        setattr_(self, "min", min(times))
+        setattr_(self, "max", max(times))
+
+    def pretty(self, fmt: TimingFormat, *, color: bool = True) -> str:
+        """Format a summary of the times in the given style.
+
+        If `color` is False, the ANSI color codes are left out of the
+        HYPERFINE output.
+        """
+        key = (fmt, color)
+        try:
+            return self._pretty_cache[key]
+        except KeyError:
+            text = self._pretty_cache[key] = self._build_pretty(fmt, color=color)
+            return text
+
+    def _build_pretty(self, fmt: TimingFormat, *, color: bool) -> str:
+        num_loops = self.num_loops
+        loop_str = f"{num_loops} loop" if num_loops == 1 else f"{num_loops} loops"
         if fmt is TimingFormat.HYPERFINE:
             order = _calc_order(self.max)
             prec = 3 if order == 0 else 1
+            # all the times share a unit, so look it up once here rather than
+            # going through format_time() for each of them
+            scale, unit = _UNITS[order]
+            width = 8 - len(unit)
 
             def time_str(timespan: float) -> str:
-                return "{:>8s}".format(
-                    format_time(timespan, precision=prec, fmt="f", order=order)
-                )
+                return f"{timespan * scale:>{width}.{prec}f}{unit}"
+
+            single_template, multi_template = _HYPERFINE_TEMPLATES[color]
 
-            bg = "\033[1;32m"
-            g = "\033[32m"
-            c = "\033[36m"
-            m = "\033[35m"
-            r = "\033[0m"
-            f = "\033[2m"
             if self.repeat == 1:
-                return (
-                    f"  Time ({bg}abs{r} ≡):     "
-                    f"   {bg}{time_str(self.times[0])}{r}           "
-                    f"    {f}{self.repeat} run, {loop_str} each{r}"
+                return single_template.format(
+                    time=time_str(self._times[0]), runs=self.repeat, loops=loop_str
                 )
-            return (
-                f"  Time ({bg}mean{r} ± {g}\u03c3{r}):  "
-                f"   {bg}{time_str(self.mean)}{r} ± {g}{time_str(self.stdev)}{r}\n"
-                f"  Range ({c}min{r} … {m}max{r}):"
-                f"   {c}{time_str(self.min)}{r} … {m}{time_str(self.max)}{r}"
-                f"    {f}{self.repeat} runs, {loop_str} each{r}"
+            return multi_template.format(
+                mean=time_str(self.mean),
+                stdev=time_str(self.stdev),
+                min=time_str(self.min),
+                max=time_str(self.max),
+                runs=self.repeat,
+                loops=loop_str,
             )
         if fmt is TimingFormat.IPYTHON:
-            mean_order = _calc_order(self.mean)
-            stdev_order = _calc_order(self.stdev) if self.repeat > 1 else mean_order
-            return (
-                f"{format_time(self.mean, order=mean_order)}"
-                f" ± {format_time(self.stdev, order=stdev_order)} per loop"
-                f" (mean ± std. dev. of {label_count(self.repeat, 'loop')},"
-                f" {loop_str} each)"
+            repeat = self.repeat
+            order_mean = _calc_order(self.mean)
+            return _IPYTHON_TEMPLATE.format(
+                mean=format_time(self.mean, order=order_mean),
+                # a single run's stdev is NaN, so use the same units as the mean
+                stdev=format_time(
+                    self.stdev,
+                    order=_calc_order(self.stdev) if repeat > 1 else order_mean,
+                ),
+                runs=f"{repeat} loop" if repeat == 1 else f"{repeat} loops",
+                loops=loop_str,
             )
         if fmt is TimingFormat.TIMEIT:
-            return (
-                f"{loop_str}, best of {self.repeat}:"
-                f" {format_time(self.min)} per loop"
+            return _TIMEIT_TEMPLATE.format(
+                loops=loop_str, runs=self.repeat, best=format_time(self.min)
             )
         raise AssertionError
 
 
+def _stdout_supports_color() -> bool:
+    stream = sys.stdout
+    if stream is None:
+        return False
+    # Jupyter's output streams render ANSI colors, but aren't terminals
+    if type(stream).__module__.startswith("ipykernel."):
+        return True
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        # not a real file, or already closed
+        return False
+
+
 def timeit(  # pylint: disable=too-many-arguments
     stmt: str | Callable[[], Any] = "pass",
     setup: str | Callable[[], Any] = "pass",
@@ -138,23 +293,39 @@ def timeit(  # pylint: disable=too-many-arguments
     # pylint: disable-next=redefined-builtin
     globals: dict[str, Any] | None = None,  # noqa: A002
     fmt: TimingFormat | None = TimingFormat.HYPERFINE,
+    color: bool | None = None,
 ) -> TimingInfo:
     """IPython %timeit work-alike, with a similar interface to timeit.timeit().
 
-    Prints a summary of the times if `fmt` is not None, and returns a
-    TimingInfo object holding the full results.
+    If `num_loops` is not given, it is picked with Timer.autorange(). When
+    that settles on a single loop, its calibration run is kept as the first
+    of the `repeat` timed runs. Prints a summary of the times if `fmt` is not
+    None, and returns a TimingInfo object holding the full results.
+
+    `color` controls whether the summary includes ANSI color codes. By
+    default, they are used if stdout is a terminal or a Jupyter notebook.
     """
+    if repeat < 1:
+        msg = "repeat must be at least 1"
+        raise ValueError(msg)
     timer_obj = Timer(stmt, setup, timer=timer, globals=globals)
     raw_times = []
     if num_loops is None:
-        num_loops, total_time = timer_obj.autorange()
-        raw_times.append(total_time)
-        repeat -= 1
-    raw_times.extend(timer_obj.repeat(repeat=repeat, number=num_loops))
-    times = tuple(t / num_loops for t in raw_times)
+        num_loops, calibration_time = timer_obj.autorange()
+        if num_loops == 1:
+            # autorange() stopped after a single run, which is slow enough
+            # that repeating it would be expensive, so keep it
+            raw_times.append(calibration_time)
+        # otherwise, autorange() made several attempts starting from cold
+        # caches, so its sample is replaced with a fresh run
+    raw_times.extend(timer_obj.repeat(repeat=repeat - len(raw_times), number=num_loops))
+    times = (t / num_loops for t in raw_times)
     info = TimingInfo(times, num_loops=num_loops)
     if fmt is not None:
-        print(info.pretty(fmt))  # noqa: T201
+        if color is None:
+            color = _stdout_supports_color()
+        text = info.pretty(fmt, color=color)
+        print(text)  # noqa: T201
     return info
 
 
@@ -172,26 +343,51 @@ class ContextTimer:
     >>> with ContextTimer("frobnicate"):
     ...     frobnicate(foo, bar)
     frobnicate: 36.1 ms
+
+    By default, the block is timed with time.perf_counter_ns(). A custom
+    `timer` must return the current time in seconds. Either way, `start`,
+    `end` and `elapsed` are in seconds.
     """
 
     def __init__(
-        self, name: str | None = None, *, timer: Callable[[], float] = default_timer
+        self, name: str | None = None, *, timer: Callable[[], float] | None = None
     ):
         self.name = name
-        self.start: float | None = None
-        self.end: float | None = None
-        self._timer = timer
+        # raw timer readings, in the units returned by the timer
+        self._start: float | None = None
+        self._end: float | None = None
+        if timer is None:
+            # integer nanoseconds avoid cancellation error for short blocks
+            self._timer: Callable[[], float] = perf_counter_ns
+            # divide rather than multiplying by 1e-9, which isn't exact
+            self._divisor = 1_000_000_000
+        else:
+            self._timer = timer
+            self._divisor = 1
+        self._str_cache: tuple[float, str] | None = None
+
+    @property
+    def start(self) -> float | None:
+        if self._start is None:
+            return None
+        return self._start / self._divisor
+
+    @property
+    def end(self) -> float | None:
+        if self._end is None:
+            return None
+        return self._end / self._divisor
 
     @property
     def elapsed(self) -> float:
-        if self.start is None:
+        if self._start is None:
             msg = "elapsed time is not accessible before entering a with block"
             raise ValueError(msg)
-        if self.end is None:
+        if self._end is None:
             # inside the with block, return the current elapsed time
-            return self._timer() - self.start
+            return (self._timer() - self._start) / self._divisor
         # outside the with block, return the total elapsed time
-        return self.end - self.start
+        return (self._end - self._start) / self._divisor
 
     @property
     def pretty_elapsed(self) -> str:
@@ -203,14 +399,19 @@ class ContextTimer:
         return str(self)
 
     def __str__(self) -> str:
-        return format_time(self.elapsed)
+        elapsed = self.elapsed
+        # the elapsed time is fixed once the block exits, so reuse the last
+        # formatted string when it hasn't changed
+        if self._str_cache is None or self._str_cache[0] != elapsed:
+            self._str_cache = (elapsed, format_time(elapsed))
+        return self._str_cache[1]
 
     def __enter__(self) -> Self:
-        self.start = self._timer()
+        self._start = self._timer()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.end = self._timer()
+        self._end = self._timer()
         if exc_type is None and self.name is not None:
             if self.name:
                 # print here is intentional
@@ -2,7 +2,9 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import copy
 import math
+import pickle
 import sys
 
 import pytest
@@ -37,16 +39,47 @@ def test_int_to_float(x_int: int) -> None:
     assert float_to_int(x_flt) == x_int
 
 
+SIGN_BIT = 1 << 63
+MAX_FINITE = float_to_int(sys.float_info.max)
+
+
+def to_ordered_int(x: float) -> int:
+    """Map a float onto an integer line where adjacent floats differ by 1."""
+    q = float_to_int(x)
+    return -(q & ~SIGN_BIT) if q & SIGN_BIT else q
+
+
+def from_ordered_int(n: int) -> float:
+    return int_to_float(-n | SIGN_BIT if n < 0 else n)
+
+
+@given(st.floats(allow_nan=False, allow_infinity=False))
+@example(0.0)
+@example(-0.0)
+@example(-5e-324)
+def test_ordered_int(x: float) -> None:
+    n = to_ordered_int(x)
+    assert from_ordered_int(n) == x
+    up = math.nextafter(x, math.inf)
+    if not math.isinf(up):
+        assert to_ordered_int(up) == n + 1
+    down = math.nextafter(x, -math.inf)
+    if not math.isinf(down):
+        assert to_ordered_int(down) == n - 1
+
+
 @st.composite
 def float_pairs(draw: st.DrawFn, max_ulps: int) -> tuple[float, float, int]:
     a = draw(st.floats(allow_nan=False, allow_infinity=False))
     ulps = draw(st.integers(min_value=-max_ulps, max_value=max_ulps))
 
     b = a
-    direction = math.copysign(math.inf, ulps)
-    for _ in range(abs(ulps)):
-        b = math.nextafter(b, direction)
-        assume(not math.isinf(b))
+    if ulps != 0:
+        # step directly in the integer representation rather than calling
+        # math.nextafter() once per ULP
+        n = to_ordered_int(a) + ulps
+        assume(abs(n) <= MAX_FINITE)
+        b = from_ordered_int(n)
 
     note(f"a = {FloatInspector(a)}\nb = {FloatInspector(b)}")
     return a, b, ulps
@@ -128,3 +161,18 @@ def test_float_inspector(x: float) -> None:
     assert fi.is_nan() == math.isnan(x)
     is_subnormal = 0 < abs(x) < sys.float_info.min
     assert fi.is_subnormal() == is_subnormal
+
+
+def test_float_inspector_frozen() -> None:
+    fi = FloatInspector(1.5)
+    with pytest.raises(AttributeError):
+        fi.float_val = 2.0
+    with pytest.raises(AttributeError):
+        del fi.raw_sign
+    assert fi == FloatInspector(1.5)
+    assert fi != FloatInspector(-1.5)
+    assert FloatInspector(0.0) != FloatInspector(-0.0)
+    assert hash(fi) == hash(FloatInspector(1.5))
+    assert FloatInspector(float("nan")) != FloatInspector(float("nan"))
+    assert copy.copy(fi) == fi
+    assert pickle.loads(pickle.dumps(fi)) == fi
@@ -2,7 +2,13 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import copy
+import io
 import math
+import pickle
+import statistics
+import sys
+from timeit import Timer
 from typing import Any
 
 import pytest
@@ -17,8 +23,11 @@ from yut23_utils.timing import (
     timeit,
 )
 
+# sample log-uniformly, so every unit gets the same share of examples
+log_uniform_times = st.floats(min_value=-10, max_value=9).map(lambda u: 10.0**u)
 
-@given(st.floats(min_value=0, max_value=1e9), st.integers(min_value=1, max_value=10))
+
+@given(log_uniform_times, st.integers(min_value=1, max_value=10))
 @example(0.0, 2)
 @example(1e-9, 3)
 @example(1e-6, 3)
@@ -50,108 +59,175 @@ def test_format_time(t: float, precision: int) -> None:
     assert len(num_str.partition(".")[2]) == precision
 
 
-class TestTimingInfo:
-    def test_properties(self):
-        times = (1.23, 3.21, 2.75, 2.53)
-        info = TimingInfo(times, 1)
-        assert info.min == 1.23
-        assert info.max == 3.21
-        assert info.mean == pytest.approx(2.4299999999999997)
-        assert info.stdev == pytest.approx(0.8486852577172922)
+TIMES = (1.23, 3.21, 2.75, 2.53)
+SINGLE_TIMES = (3.14159,)
 
-    def test_stdev_single(self):
-        times = (1.0,)
-        info = TimingInfo(times, 1)
-        assert math.isnan(info.stdev)
 
-    def test_pretty_hyperfine(self):
-        times = (1.23, 3.21, 2.75, 2.53)
+@pytest.fixture
+def info(request) -> TimingInfo:
+    """A TimingInfo built from `(times, num_loops)` in the indirect parameter."""
+    return TimingInfo(*request.param)
 
-        info = TimingInfo(times, 1)
-        assert (
-            info.pretty(TimingFormat.HYPERFINE)
-            == """\
+
+HYPERFINE_MULTI_1 = """\
   Time (\x1b[1;32mmean\x1b[0m ± \x1b[32m\u03c3\x1b[0m):     \x1b[1;32m 2.430 s\
 \x1b[0m ± \x1b[32m 0.849 s\x1b[0m
   Range (\x1b[36mmin\x1b[0m … \x1b[35mmax\x1b[0m):   \x1b[36m 1.230 s\
 \x1b[0m … \x1b[35m 3.210 s\x1b[0m    \x1b[2m4 runs, 1 loop each\x1b[0m"""
-        )
-
-        info = TimingInfo(times, 3)
-        assert info.pretty(TimingFormat.HYPERFINE) == (
-            "  Time (\x1b[1;32mmean\x1b[0m ± \x1b[32m\u03c3\x1b[0m):"
-            "     \x1b[1;32m 2.430 s\x1b[0m ± \x1b[32m 0.849 s\x1b[0m\n"
-            "  Range (\x1b[36mmin\x1b[0m … \x1b[35mmax\x1b[0m):"
-            "   \x1b[36m 1.230 s\x1b[0m … \x1b[35m 3.210 s\x1b[0m"
-            "    \x1b[2m4 runs, 3 loops each\x1b[0m"
-        )
-
-    def test_pretty_hyperfine_single(self):
-        times = (3.14159,)
-
-        info = TimingInfo(times, 1)
-        assert info.pretty(TimingFormat.HYPERFINE) == (
-            "  Time (\x1b[1;32mabs\x1b[0m ≡):"
-            "        \x1b[1;32m 3.142 s\x1b[0m"
-            "               \x1b[2m1 run, 1 loop each\x1b[0m"
-        )
-
-        info = TimingInfo(times, 2)
-        assert info.pretty(TimingFormat.HYPERFINE) == (
-            "  Time (\x1b[1;32mabs\x1b[0m ≡):"
-            "        \x1b[1;32m 3.142 s\x1b[0m"
-            "               \x1b[2m1 run, 2 loops each\x1b[0m"
-        )
+HYPERFINE_MULTI_3 = (
+    "  Time (\x1b[1;32mmean\x1b[0m ± \x1b[32m\u03c3\x1b[0m):"
+    "     \x1b[1;32m 2.430 s\x1b[0m ± \x1b[32m 0.849 s\x1b[0m\n"
+    "  Range (\x1b[36mmin\x1b[0m … \x1b[35mmax\x1b[0m):"
+    "   \x1b[36m 1.230 s\x1b[0m … \x1b[35m 3.210 s\x1b[0m"
+    "    \x1b[2m4 runs, 3 loops each\x1b[0m"
+)
 
-    def test_pretty_ipython(self):
-        times = (1.23, 3.21, 2.75, 2.53)
 
-        info = TimingInfo(times, 1)
-        assert (
-            info.pretty(TimingFormat.IPYTHON)
-            == "2.43 s ± 849 ms per loop (mean ± std. dev. of 4 loops, 1 loop each)"
-        )
+class TestTimingInfo:
+    @pytest.mark.parametrize("info", [(TIMES, 1)], indirect=True)
+    def test_properties(self, info):
+        assert info.min == 1.23
+        assert info.max == 3.21
+        assert info.mean == pytest.approx(2.4299999999999997)
+        assert info.stdev == pytest.approx(0.8486852577172922)
 
-        info = TimingInfo(times, 3)
-        assert (
-            info.pretty(TimingFormat.IPYTHON)
-            == "2.43 s ± 849 ms per loop (mean ± std. dev. of 4 loops, 3 loops each)"
+    @given(
+        st.lists(
+            st.floats(min_value=0, max_value=1e3, allow_subnormal=False), min_size=2
         )
-
-    def test_pretty_ipython_single(self):
-        times = (3.14159,)
-
+    )
+    def test_stats_match_statistics(self, times: list[float]) -> None:
         info = TimingInfo(times, 1)
-        assert info.pretty(TimingFormat.IPYTHON) == (
-            "3.14 s ± nan s per loop (mean ± std. dev. of 1 loop, 1 loop each)"
-        )
-
-        info = TimingInfo(times, 2)
-        assert info.pretty(TimingFormat.IPYTHON) == (
-            "3.14 s ± nan s per loop (mean ± std. dev. of 1 loop, 2 loops each)"
-        )
-
-    def test_pretty_timeit(self):
-        times = (1.23, 3.21, 2.75, 2.53)
+        assert info.mean == pytest.approx(statistics.mean(times), rel=1e-12)
+        assert info.stdev == pytest.approx(statistics.stdev(times), rel=1e-9, abs=1e-12)
+        assert info.min == min(times)
+        assert info.max == max(times)
+
+    def test_value_semantics(self):
+        info = TimingInfo((1.0, 2.0), 3)
+        assert info == TimingInfo((1.0, 2.0), 3)
+        assert info != TimingInfo((1.0, 2.0), 4)
+        assert hash(info) == hash(TimingInfo((1.0, 2.0), 3))
+        signed_zero = TimingInfo((-0.0, 2.0), 3)
+        assert signed_zero == TimingInfo((0.0, 2.0), 3)
+        assert hash(signed_zero) == hash(TimingInfo((0.0, 2.0), 3))
+        assert repr(info) == "TimingInfo(times=(1.0, 2.0), num_loops=3)"
+        assert eval(repr(info)) == info
+        with pytest.raises(AttributeError):
+            info.times = (3.0,)
+        assert info.times == (1.0, 2.0)
+        with pytest.raises(TypeError):
+            info.times[0] = 0.5  # type: ignore[index]
+        with pytest.raises(AttributeError):
+            info.extra = 1
+        with pytest.raises(AttributeError):
+            info.mean = 0.0
+        assert copy.copy(info) == info
+        assert pickle.loads(pickle.dumps(info)) == info
 
+    def test_stdev_single(self):
+        times = (1.0,)
         info = TimingInfo(times, 1)
-        assert info.pretty(TimingFormat.TIMEIT) == "1 loop, best of 4: 1.23 s per loop"
-
-        info = TimingInfo(times, 3)
-        assert info.pretty(TimingFormat.TIMEIT) == "3 loops, best of 4: 1.23 s per loop"
-
-    def test_pretty_timeit_single(self):
-        times = (3.14159,)
+        assert math.isnan(info.stdev)
 
-        info = TimingInfo(times, 1)
-        assert info.pretty(TimingFormat.TIMEIT) == (
-            "1 loop, best of 1: 3.14 s per loop"
+    @pytest.mark.parametrize(
+        ("info", "fmt", "expected"),
+        [
+            ((TIMES, 1), TimingFormat.HYPERFINE, HYPERFINE_MULTI_1),
+            ((TIMES, 3), TimingFormat.HYPERFINE, HYPERFINE_MULTI_3),
+            (
+                (SINGLE_TIMES, 1),
+                TimingFormat.HYPERFINE,
+                "  Time (\x1b[1;32mabs\x1b[0m ≡):"
+                "        \x1b[1;32m 3.142 s\x1b[0m"
+                "               \x1b[2m1 run, 1 loop each\x1b[0m",
+            ),
+            (
+                (SINGLE_TIMES, 2),
+                TimingFormat.HYPERFINE,
+                "  Time (\x1b[1;32mabs\x1b[0m ≡):"
+                "        \x1b[1;32m 3.142 s\x1b[0m"
+                "               \x1b[2m1 run, 2 loops each\x1b[0m",
+            ),
+            (
+                (TIMES, 1),
+                TimingFormat.IPYTHON,
+                "2.43 s ± 849 ms per loop (mean ± std. dev. of 4 loops, 1 loop each)",
+            ),
+            (
+                (TIMES, 3),
+                TimingFormat.IPYTHON,
+                "2.43 s ± 849 ms per loop (mean ± std. dev. of 4 loops, 3 loops each)",
+            ),
+            (
+                (SINGLE_TIMES, 1),
+                TimingFormat.IPYTHON,
+                "3.14 s ± nan s per loop (mean ± std. dev. of 1 loop, 1 loop each)",
+            ),
+            (
+                (SINGLE_TIMES, 2),
+                TimingFormat.IPYTHON,
+                "3.14 s ± nan s per loop (mean ± std. dev. of 1 loop, 2 loops each)",
+            ),
+            (
+                (TIMES, 1),
+                TimingFormat.TIMEIT,
+                "1 loop, best of 4: 1.23 s per loop",
+            ),
+            (
+                (TIMES, 3),
+                TimingFormat.TIMEIT,
+                "3 loops, best of 4: 1.23 s per loop",
+            ),
+            (
+                (SINGLE_TIMES, 1),
+                TimingFormat.TIMEIT,
+                "1 loop, best of 1: 3.14 s per loop",
+            ),
+            (
+                (SINGLE_TIMES, 2),
+                TimingFormat.TIMEIT,
+                "2 loops, best of 1: 3.14 s per loop",
+            ),
+        ],
+        indirect=["info"],
+    )
+    def test_pretty(self, info, fmt, expected):
+        assert info.pretty(fmt) == expected
+
+    @pytest.mark.parametrize(
+        ("info", "expected"),
+        [
+            (
+                (TIMES, 3),
+                "  Time (mean ± \u03c3):      2.430 s ±  0.849 s\n"
+                "  Range (min … max):    1.230 s …  3.210 s    4 runs, 3 loops each",
+            ),
+            (
+                (SINGLE_TIMES, 1),
+                "  Time (abs ≡):         3.142 s               1 run, 1 loop each",
+            ),
+        ],
+        indirect=["info"],
+    )
+    def test_pretty_hyperfine_plain(self, info, expected):
+        assert info.pretty(TimingFormat.HYPERFINE, color=False) == expected
+
+    def test_pretty_hyperfine_units(self):
+        info = TimingInfo((1.5e-3, 2.5e-3), 10)
+        assert info.pretty(TimingFormat.HYPERFINE) == (
+            "  Time (\x1b[1;32mmean\x1b[0m ± \x1b[32m\u03c3\x1b[0m):"
+            "     \x1b[1;32m  2.0 ms\x1b[0m ± \x1b[32m  0.7 ms\x1b[0m\n"
+            "  Range (\x1b[36mmin\x1b[0m … \x1b[35mmax\x1b[0m):"
+            "   \x1b[36m  1.5 ms\x1b[0m … \x1b[35m  2.5 ms\x1b[0m"
+            "    \x1b[2m2 runs, 10 loops each\x1b[0m"
         )
 
-        info = TimingInfo(times, 2)
-        assert info.pretty(TimingFormat.TIMEIT) == (
-            "2 loops, best of 1: 3.14 s per loop"
-        )
+    def test_pretty_cached(self):
+        info = TimingInfo((1.23, 3.21, 2.75, 2.53), 1)
+        for fmt in TimingFormat:
+            assert info.pretty(fmt) is info.pretty(fmt)
+        assert info.pretty(TimingFormat.TIMEIT) != info.pretty(TimingFormat.IPYTHON)
 
 
 # Borrowed from cpython/Lib/test/test_timeit.py
@@ -162,17 +238,24 @@ class FakeTimer:
         self.count = 0
         self.setup_calls = 0
         self.seconds_per_increment = seconds_per_increment
+        self.current = self.BASE_TIME
 
     def __call__(self) -> float:
-        return self.BASE_TIME + self.count * self.seconds_per_increment
+        return self.current
 
     def inc(self) -> None:
         self.count += 1
+        self.current += self.seconds_per_increment
 
     def setup(self) -> None:
         self.setup_calls += 1
 
 
+@pytest.fixture
+def fake_timer() -> FakeTimer:
+    return FakeTimer()
+
+
 class TestTimeit:
     @classmethod
     def run(cls, **kwargs: Any) -> tuple[TimingInfo, FakeTimer]:
@@ -199,8 +282,20 @@ class TestTimeit:
         assert info.num_loops == 10
         assert info.times == (1.0,) * 3
 
-    def test_timeit_autorange(self):
+    def test_timeit_no_format(self, mocker, capsys):
+        # nothing should be computed or formatted for display without a format
+        fill_stats = mocker.spy(TimingInfo, "_fill_stats")
+        pretty = mocker.spy(TimingInfo, "pretty")
+        self.run(repeat=3, num_loops=10, fmt=None)
+        assert fill_stats.call_count == 0
+        assert pretty.call_count == 0
+        assert capsys.readouterr().out == ""
+
+    def test_timeit_autorange(self, mocker):
+        repeat = mocker.spy(Timer, "repeat")
         info, timer = self.run(seconds_per_increment=1 / 1024, repeat=4, fmt=None)
+        # autorange() needed several attempts, so all the timed runs are fresh
+        repeat.assert_called_once_with(mocker.ANY, repeat=4, number=500)
         # we don't care about the specifics of Timer.autorange(), so don't check
         # the exact numbers
         assert timer.setup_calls >= 4
@@ -210,6 +305,50 @@ class TestTimeit:
         assert info.num_loops == 500
         assert info.times == (1 / 1024,) * 4
 
+    def test_timeit_autorange_slow(self, mocker):
+        repeat = mocker.spy(Timer, "repeat")
+        # a single loop takes long enough that autorange() stops after one
+        # run, which is then reused as the first timed run
+        info, timer = self.run(seconds_per_increment=1.0, repeat=3, fmt=None)
+        repeat.assert_called_once_with(mocker.ANY, repeat=2, number=1)
+        assert timer.setup_calls == 3
+        assert timer.count == 3
+
+        assert info.repeat == 3
+        assert info.num_loops == 1
+        assert info.times == (1.0,) * 3
+
+    def test_timeit_repeat_zero(self):
+        with pytest.raises(ValueError, match="repeat must be at least 1"):
+            self.run(repeat=0, fmt=None)
+
+    def test_timeit_output_no_color(self, capsys):
+        # captured stdout isn't a terminal
+        self.run(repeat=3, num_loops=5, fmt=TimingFormat.HYPERFINE)
+        captured = capsys.readouterr()
+        assert "\x1b[" not in captured.out
+        assert "3 runs, 5 loops each" in captured.out
+
+    def test_timeit_output_color(self, capsys):
+        self.run(repeat=3, num_loops=5, fmt=TimingFormat.HYPERFINE, color=True)
+        captured = capsys.readouterr()
+        assert "\x1b[" in captured.out
+
+    def test_timeit_output_jupyter(self, monkeypatch):
+        # stand-in for ipykernel.iostream.OutStream, which isn't a terminal
+        class OutStream(io.StringIO):
+            __module__ = "ipykernel.iostream"
+
+        stream = OutStream()
+        monkeypatch.setattr(sys, "stdout", stream)
+        self.run(repeat=3, num_loops=5, fmt=TimingFormat.HYPERFINE)
+        assert "\x1b[" in stream.getvalue()
+
+    def test_timeit_no_stdout(self, monkeypatch):
+        monkeypatch.setattr(sys, "stdout", None)
+        info, _ = self.run(repeat=3, num_loops=5, fmt=TimingFormat.HYPERFINE)
+        assert info.repeat == 3
+
     def test_timeit_output(self, capsys):
         self.run(repeat=3, num_loops=5, fmt=TimingFormat.TIMEIT)
         captured = capsys.readouterr()
@@ -217,8 +356,7 @@ class TestTimeit:
 
 
 class TestContextTimer:
-    def test_elapsed(self):
-        fake_timer = FakeTimer()
+    def test_elapsed(self, fake_timer):
         with ContextTimer(timer=fake_timer) as t:
             assert t.elapsed == 0.0
             fake_timer.inc()
@@ -228,23 +366,41 @@ class TestContextTimer:
         assert t.elapsed == 2.0
         fake_timer.inc()
         assert t.elapsed == 2.0
+        assert t.start == FakeTimer.BASE_TIME
+        assert t.end == FakeTimer.BASE_TIME + 2.0
 
-    def test_str(self):
-        fake_timer = FakeTimer()
+    def test_default_timer(self, mocker):
+        mocker.patch(
+            "yut23_utils.timing.perf_counter_ns", side_effect=[1000, 1003, 1007]
+        )
+        # these would be off by an ulp if scaled with `* 1e-9`
+        with ContextTimer() as t:
+            assert t.elapsed == 3e-9
+        assert t.elapsed == 7e-9
+        # the endpoints are in seconds too, not raw nanoseconds
+        assert t.start == 1e-6
+        assert t.end == 1.007e-6
+
+    def test_str(self, fake_timer):
         with ContextTimer(timer=fake_timer) as t:
             assert str(t) == format_time(0.0)
             fake_timer.inc()
             fake_timer.inc()
             assert str(t) == format_time(2.0)
         assert str(t) == format_time(2.0)
+        # the formatted string is reused while the elapsed time is unchanged
+        s = str(t)
+        assert str(t) is s
 
-    def test_pretty_elapsed(self):
-        fake_timer = FakeTimer()
+    def test_pretty_elapsed(self, fake_timer):
         with (
             ContextTimer(timer=fake_timer) as t,
             pytest.warns(DeprecationWarning, match="use str"),
         ):
             assert t.pretty_elapsed == format_time(0.0)
+        # every access warns, so a filtered or earlier one can't hide it
+        with pytest.warns(DeprecationWarning, match="use str"):
+            assert t.pretty_elapsed == format_time(0.0)
 
     def test_elapsed_before_with(self):
         t = ContextTimer()
@@ -264,3 +420,9 @@ class TestContextTimer:
             fake_timer.inc()
         captured = capsys.readouterr()
         assert captured.out == "36.1 ms\n"
+
+    def test_printing_no_stdout(self, monkeypatch, fake_timer):
+        # e.g. under pythonw, where print() silently does nothing
+        monkeypatch.setattr(sys, "stdout", None)
+        with ContextTimer("foobar", timer=fake_timer):
+            fake_timer.inc()